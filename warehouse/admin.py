@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, StockMovement, Invoice, InvoiceItem
+from .models import Category, Product, StockMovement, Invoice, InvoiceItem, Stocktake
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -8,7 +8,7 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'sku', 'category', 'price', 'quantity', 'min_quantity', 'location']
+    list_display = ['name', 'sku', 'category', 'price', 'quantity', 'min_quantity', 'reorder_quantity', 'location']
     list_filter = ['category', 'created_at']
     search_fields = ['name', 'sku']
     readonly_fields = ['created_at', 'updated_at']
@@ -16,7 +16,7 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
     list_display = ['product', 'movement_type', 'quantity', 'reason', 'created_at', 'created_by']
-    list_filter = ['movement_type', 'created_at']
+    list_filter = ['movement_type', 'is_opening_balance', 'is_stocktake_adjustment', 'created_at']
     search_fields = ['product__name', 'reason']
 
 class InvoiceItemInline(admin.TabularInline):
@@ -26,8 +26,14 @@ class InvoiceItemInline(admin.TabularInline):
 
 @admin.register(Invoice)
 class InvoiceAdmin(admin.ModelAdmin):
-    list_display = ['number', 'created_at', 'created_by']
-    list_filter = ['created_at']
+    list_display = ['number', 'created_at', 'created_by', 'picked_at']
+    list_filter = ['created_at', 'picked_at']
     search_fields = ['number']
     readonly_fields = ['number', 'created_at', 'created_by']
-    inlines = [InvoiceItemInline]
\ No newline at end of file
+    inlines = [InvoiceItemInline]
+
+@admin.register(Stocktake)
+class StocktakeAdmin(admin.ModelAdmin):
+    list_display = ['pk', 'status', 'comment', 'created_at', 'created_by', 'applied_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['status', 'created_at', 'created_by', 'applied_at']
@@ -3,4 +3,12 @@ from django.apps import AppConfig
 class WarehouseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'warehouse'
-    verbose_name = 'Складской учет'
\ No newline at end of file
+    verbose_name = 'Складской учет'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        from django.conf import settings
+        if settings.PRELOAD_PDF:
+            from .startup import preload_pdf
+            preload_pdf()
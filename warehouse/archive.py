@@ -0,0 +1,276 @@
+import gzip
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum, Case, When, F, Value, IntegerField
+from django.utils import timezone
+
+from .models import Product, StockMovement
+
+
+ARCHIVE_FIELDS = [
+    'id', 'product_id', 'movement_type', 'quantity',
+    'reason', 'created_at', 'created_by_id', 'is_stocktake_adjustment',
+]
+STATE_FILE = 'state.json'
+INDEX_SUFFIX = '.index'
+# Запись индекса: id товара, смещение и длина gzip-члена
+INDEX_RECORD = struct.Struct('<qQQ')
+
+
+def _archive_dir(archive_dir=None):
+    return str(archive_dir or settings.MOVEMENT_ARCHIVE_ROOT)
+
+
+def _month_paths(archive_dir, month):
+    base = os.path.join(archive_dir, f'movements-{month}')
+    return f'{base}.ndjson.gz', f'{base}{INDEX_SUFFIX}'
+
+
+def _month_key(dt):
+    return timezone.localtime(dt).strftime('%Y-%m')
+
+
+def retention_cutoff(months):
+    """Начало месяца, отстоящего от текущего на months месяцев."""
+    now = timezone.localtime()
+    month_index = now.year * 12 + now.month - 1 - months
+    return timezone.make_aware(datetime(month_index // 12, month_index % 12 + 1, 1))
+
+
+def get_archive_cutoff(archive_dir=None):
+    path = os.path.join(_archive_dir(archive_dir), STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return datetime.fromisoformat(json.load(f)['cutoff'])
+
+
+def _save_archive_cutoff(archive_dir, cutoff):
+    path = os.path.join(archive_dir, STATE_FILE)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'cutoff': cutoff.isoformat()}, f)
+    os.replace(tmp_path, path)
+
+
+def _serialize(row):
+    return json.dumps(
+        {**row, 'created_at': row['created_at'].isoformat()},
+        ensure_ascii=False,
+        separators=(',', ':')
+    )
+
+
+def _save_index(index_path, entries):
+    """
+    Сливает новые записи с индексом месяца и сохраняет его отсортированным
+    по id товара. Файл заменяется целиком, поэтому читатели никогда
+    не видят неотсортированный индекс.
+    """
+    if os.path.exists(index_path):
+        with open(index_path, 'rb') as f:
+            entries = [*INDEX_RECORD.iter_unpack(f.read()), *entries]
+    entries.sort()
+
+    tmp_path = f'{index_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b''.join(INDEX_RECORD.pack(*entry) for entry in entries))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, index_path)
+
+
+def _write_archive(archive_dir, rows):
+    """
+    Дописывает движения в помесячные файлы gzip NDJSON.
+
+    Движения одного товара за месяц пишутся отдельным gzip-членом,
+    его смещение и длина попадают в отсортированный двоичный индекс,
+    поэтому история товара читается без распаковки всего файла.
+    """
+    files = {}
+    entries = {}
+    archived = 0
+    try:
+        for product_id, product_rows in groupby(rows, key=lambda row: row['product_id']):
+            for month, month_rows in groupby(product_rows, key=lambda row: _month_key(row['created_at'])):
+                if month not in files:
+                    files[month] = open(_month_paths(archive_dir, month)[0], 'ab')
+                    entries[month] = []
+                data_file = files[month]
+
+                lines = [_serialize(row) for row in month_rows]
+                member = gzip.compress(('\n'.join(lines) + '\n').encode('utf-8'))
+                entries[month].append((product_id, data_file.tell(), len(member)))
+                data_file.write(member)
+                archived += len(lines)
+
+        for data_file in files.values():
+            data_file.flush()
+            os.fsync(data_file.fileno())
+    finally:
+        for data_file in files.values():
+            data_file.close()
+
+    # Индекс сохраняется после данных: записи в нем всегда указывают
+    # на уже записанные gzip-члены
+    for month, month_entries in entries.items():
+        _save_index(_month_paths(archive_dir, month)[1], month_entries)
+
+    return archived
+
+
+def archive_movements(cutoff, archive_dir=None):
+    """
+    Переносит движения старше cutoff в архив и оставляет вместо них
+    по одному движению входящего остатка на каждый товар.
+
+    Архив пишется до фиксации транзакции: если удаление откатится,
+    повторный запуск допишет те же движения еще раз, а при чтении
+    дубли отбрасываются по id.
+    """
+    archive_dir = _archive_dir(archive_dir)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    with transaction.atomic():
+        old = StockMovement.objects.filter(created_at__lt=cutoff)
+        balances = old.values('product_id').annotate(
+            balance=Sum(Case(
+                When(movement_type='in', then=F('quantity')),
+                default=F('quantity') * Value(-1),
+                output_field=IntegerField()
+            ))
+        ).order_by()
+
+        rows = old.filter(is_opening_balance=False).order_by(
+            'product_id', 'created_at', 'id'
+        ).values(*ARCHIVE_FIELDS).iterator(chunk_size=5000)
+        archived = _write_archive(archive_dir, rows)
+
+        opening_balances = [
+            StockMovement(
+                product_id=item['product_id'],
+                movement_type='in' if item['balance'] > 0 else 'out',
+                quantity=abs(item['balance']),
+                reason=f'Входящий остаток на {timezone.localtime(cutoff):%d.%m.%Y}',
+                is_opening_balance=True,
+            )
+            for item in balances
+            if item['balance']
+        ]
+
+        # Страница товара выводит последние движения, ETag строится по updated_at
+        Product.objects.filter(
+            pk__in=old.values('product_id')
+        ).update(updated_at=timezone.now())
+
+        old.delete()
+        created_since = timezone.now()
+        # bulk_create не вызывает StockMovement.save и не меняет остатки товаров
+        StockMovement.objects.bulk_create(opening_balances, batch_size=1000)
+        StockMovement.objects.filter(
+            is_opening_balance=True, created_at__gte=created_since
+        ).update(created_at=cutoff)
+
+        previous_cutoff = get_archive_cutoff(archive_dir)
+        if previous_cutoff is None or cutoff > previous_cutoff:
+            _save_archive_cutoff(archive_dir, cutoff)
+
+    return archived, len(opening_balances)
+
+
+def _product_members(index_path, product_id):
+    """
+    Смещения и длины gzip-членов товара: двоичный поиск по
+    отсортированному индексу без чтения его целиком в память.
+    """
+    with open(index_path, 'rb') as f:
+        count = os.fstat(f.fileno()).st_size // INDEX_RECORD.size
+        if not count:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                if INDEX_RECORD.unpack_from(index, middle * INDEX_RECORD.size)[0] < product_id:
+                    low = middle + 1
+                else:
+                    high = middle
+
+            members = []
+            for position in range(low, count):
+                entry_product_id, offset, length = INDEX_RECORD.unpack_from(index, position * INDEX_RECORD.size)
+                if entry_product_id != product_id:
+                    break
+                members.append((offset, length))
+    return members
+
+
+def iter_archived_movements(product_id, date_from=None, date_to=None, archive_dir=None):
+    """Движения товара из архива за период, в порядке возрастания даты."""
+    archive_dir = _archive_dir(archive_dir)
+    if not os.path.isdir(archive_dir):
+        return
+
+    months = sorted(
+        name[len('movements-'):-len(INDEX_SUFFIX)]
+        for name in os.listdir(archive_dir)
+        if name.startswith('movements-') and name.endswith(INDEX_SUFFIX)
+    )
+    if date_from:
+        months = [month for month in months if month >= _month_key(date_from)]
+    if date_to:
+        months = [month for month in months if month <= _month_key(date_to)]
+
+    seen = set()
+    for month in months:
+        data_path, index_path = _month_paths(archive_dir, month)
+        members = _product_members(index_path, product_id)
+        if not members:
+            continue
+        with open(data_path, 'rb') as f:
+            for offset, length in members:
+                f.seek(offset)
+                for line in gzip.decompress(f.read(length)).splitlines():
+                    row = json.loads(line)
+                    if row['id'] in seen:
+                        continue
+                    seen.add(row['id'])
+                    # Архивы, записанные до появления признака корректировки
+                    row.setdefault('is_stocktake_adjustment', False)
+                    row['created_at'] = datetime.fromisoformat(row['created_at'])
+                    if date_from and row['created_at'] < date_from:
+                        continue
+                    if date_to and row['created_at'] >= date_to:
+                        continue
+                    yield row
+
+
+def get_movement_history(product_id, date_from=None, date_to=None, archive_dir=None):
+    """
+    История движений товара за период [date_from, date_to).
+
+    Если период начинается раньше границы архива, движения читаются
+    и из архива; свернутые входящие остатки в историю не попадают.
+    """
+    hot = StockMovement.objects.filter(product_id=product_id, is_opening_balance=False)
+    if date_from:
+        hot = hot.filter(created_at__gte=date_from)
+    if date_to:
+        hot = hot.filter(created_at__lt=date_to)
+    history = list(hot.values(*ARCHIVE_FIELDS))
+
+    cutoff = get_archive_cutoff(archive_dir)
+    if cutoff and (date_from is None or date_from < cutoff):
+        archived_to = min(date_to, cutoff) if date_to else cutoff
+        history.extend(iter_archived_movements(product_id, date_from, archived_to, archive_dir))
+
+    history.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+    return history
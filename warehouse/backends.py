@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .caching import get_cached_user, set_cached_user
+
+UserModel = get_user_model()
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend, который берет пользователя сессии из кэша,
+    а не из базы данных на каждом запросе.
+    Кэш сбрасывается сигналами при изменении или удалении пользователя.
+    """
+
+    def get_user(self, user_id):
+        user = get_cached_user(user_id)
+        if user is None:
+            try:
+                user = UserModel._default_manager.get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            set_cached_user(user)
+        return user if self.user_can_authenticate(user) else None
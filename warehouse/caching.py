@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+
+USER_CACHE_KEY = 'warehouse:user:{}'
+
+
+def get_cached_user(user_id):
+    return cache.get(USER_CACHE_KEY.format(user_id))
+
+
+def set_cached_user(user):
+    cache.set(USER_CACHE_KEY.format(user.pk), user, settings.USER_CACHE_TIMEOUT)
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(USER_CACHE_KEY.format(user_id))
+
+
+CATEGORY_CHOICES_KEY = 'warehouse:category_choices:{}'
+
+
+def get_category_version():
+    """
+    Версия справочника категорий для ключей кэша и ETag.
+
+    Считается по базе (число категорий и последнее изменение), поэтому
+    все воркеры видят переименование сразу, даже с локальным кэшем.
+    """
+    from .models import Category
+
+    state = Category.objects.aggregate(count=Count('id'), updated_at=Max('updated_at'))
+    updated_at = state['updated_at']
+    return f"{state['count']}-{int(updated_at.timestamp() * 1000000) if updated_at else 0}"
+
+
+def get_category_choices(version=None):
+    from .models import Category
+
+    return cache.get_or_set(
+        CATEGORY_CHOICES_KEY.format(version or get_category_version()),
+        lambda: list(Category.objects.values_list('pk', 'name')),
+        settings.FRAGMENT_CACHE_TIMEOUT
+    )
@@ -1,18 +1,24 @@
+from functools import wraps
+
 from django.shortcuts import redirect
 from django.contrib import messages
 
 
 def admin_required(view_func):
 
+    @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_authenticated:
+        # request.user уже загружен из кэша CachedModelBackend,
+        # проверка прав не обращается к базе данных
+        user = request.user
+        if not user.is_authenticated:
             messages.error(request, 'Необходимо войти в систему')
             return redirect('warehouse:login')
 
-        if not request.user.is_staff:
+        if not user.is_staff:
             messages.error(request, 'Недостаточно прав для выполнения этого действия')
             return redirect('warehouse:product_list')
 
         return view_func(request, *args, **kwargs)
 
-    return wrapper
\ No newline at end of file
+    return wrapper
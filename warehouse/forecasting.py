@@ -0,0 +1,159 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Product, StockMovement
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def iter_daily_demand(start_date, days):
+    """
+    Расход всех товаров по дням: для каждого дня пара массивов
+    (id товаров, количество). Списания по инвентаризации расходом
+    не считаются.
+
+    На день приходится один сгруппированный запрос по диапазону
+    created_at, поэтому используется индекс и не нужна функция
+    усечения даты в базе данных.
+    """
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        rows = list(StockMovement.objects.filter(
+            movement_type='out',
+            is_opening_balance=False,
+            is_stocktake_adjustment=False,
+            created_at__gte=_day_start(day),
+            created_at__lt=_day_start(day + timedelta(days=1)),
+        ).values('product_id').annotate(
+            total=Sum('quantity')
+        ).values_list('product_id', 'total').order_by())
+        rows = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        yield rows[:, 0], rows[:, 1].astype(np.float64)
+
+
+def forecast_demand(product_ids, daily_demand, days, method='ses', alpha=0.3, window=28):
+    """
+    Прогноз дневного расхода для всех товаров одним проходом по дням.
+
+    product_ids - отсортированный массив id, daily_demand - результат
+    iter_daily_demand за days дней. ses - простое экспоненциальное сглаживание,
+    ma - скользящее среднее за последние window дней.
+    Возвращает (прогноз, стандартное отклонение, признак наличия расхода).
+    """
+    if method == 'ma' and window < 1:
+        raise ValueError('window должен быть не меньше 1')
+
+    count = len(product_ids)
+    level = None
+    total = np.zeros(count)
+    total_sq = np.zeros(count)
+    recent = np.zeros(count)
+    observed = 0
+    for offset, (row_ids, quantities) in enumerate(daily_demand):
+        daily = np.zeros(count)
+        index = np.searchsorted(product_ids, row_ids)
+        # Расход товаров, которых нет в выборке, отбрасывается
+        known = index < count
+        known[known] = product_ids[index[known]] == row_ids[known]
+        daily[index[known]] = quantities[known]
+
+        total += daily
+        total_sq += daily * daily
+        observed += 1
+        if method == 'ma':
+            if offset >= days - window:
+                recent += daily
+        elif level is None:
+            level = daily
+        else:
+            level = alpha * daily + (1 - alpha) * level
+
+    if not observed:
+        return np.zeros(count), np.zeros(count), np.zeros(count, dtype=bool)
+
+    mean = total / observed
+    sigma = np.sqrt(np.maximum(total_sq / observed - mean * mean, 0))
+    forecast = recent / min(window, observed) if method == 'ma' else level
+    return forecast, sigma, total > 0
+
+
+def suggest_replenishment(forecast, sigma, lead_time=7, review_period=14, service_z=1.65):
+    """
+    Рекомендуемые минимальный остаток (точка заказа) и объем дозаказа.
+
+    Минимальный остаток покрывает прогнозный расход за срок поставки
+    плюс страховой запас z * sigma * sqrt(срок поставки), объем
+    дозаказа покрывает расход за период между заказами.
+    """
+    safety_stock = service_z * sigma * np.sqrt(lead_time)
+    min_quantity = np.ceil(forecast * lead_time + safety_stock).astype(np.int64)
+    reorder_quantity = np.ceil(forecast * review_period).astype(np.int64)
+    return min_quantity, reorder_quantity
+
+
+def _save_replenishment(product_ids, min_quantity, reorder_quantity, batch_size=500):
+    """
+    Сохраняет новые значения UPDATE-ами по группам товаров с одинаковой
+    парой (min_quantity, reorder_quantity): различных пар немного,
+    а bulk_update собирает CASE по каждой строке и на миллионе товаров
+    работает на порядок дольше.
+    """
+    groups = defaultdict(list)
+    for product_id, minimum, reorder in zip(
+        product_ids.tolist(), min_quantity.tolist(), reorder_quantity.tolist()
+    ):
+        groups[minimum, reorder].append(product_id)
+
+    # updated_at меняется вместе с порогом, чтобы сбросить кэш строк списка товаров
+    now = timezone.now()
+    with transaction.atomic():
+        for (minimum, reorder), ids in groups.items():
+            for start in range(0, len(ids), batch_size):
+                Product.objects.filter(pk__in=ids[start:start + batch_size]).update(
+                    min_quantity=minimum,
+                    reorder_quantity=reorder,
+                    updated_at=now,
+                )
+
+
+def update_replenishment(days=90, dry_run=False, method='ses', alpha=0.3, window=28, **options):
+    """
+    Пересчитывает min_quantity и reorder_quantity для всего каталога.
+
+    Товары читаются одним запросом, расход - одним запросом на день,
+    расчет идет векторно по всем товарам сразу. Сохраняются только
+    изменившиеся товары; товары без расхода за период не меняются.
+    Возвращает (число товаров, число изменившихся).
+    """
+    start_date = timezone.localdate() - timedelta(days=days)
+
+    products = np.array(
+        list(Product.objects.order_by('pk').values_list('pk', 'min_quantity', 'reorder_quantity')),
+        dtype=np.int64
+    ).reshape(-1, 3)
+    product_ids = products[:, 0]
+
+    forecast, sigma, has_demand = forecast_demand(
+        product_ids,
+        iter_daily_demand(start_date, days),
+        days,
+        method=method,
+        alpha=alpha,
+        window=window
+    )
+    min_quantity, reorder_quantity = suggest_replenishment(forecast, sigma, **options)
+
+    changed = has_demand & (
+        (min_quantity != products[:, 1]) | (reorder_quantity != products[:, 2])
+    )
+    if not dry_run:
+        _save_replenishment(product_ids[changed], min_quantity[changed], reorder_quantity[changed])
+
+    return len(product_ids), int(changed.sum())
@@ -1,7 +1,9 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Product, Category, StockMovement
+from django.db.models import Q, F
+from .models import Product, Category, StockMovement, Invoice, Stocktake
+from .caching import get_category_choices, get_category_version
 
 
 class UserRegisterForm(UserCreationForm):
@@ -16,7 +18,7 @@ class ProductForm(forms.ModelForm):
     class Meta:
         model = Product
         fields = ['name', 'category', 'sku', 'description', 'price',
-                  'quantity', 'min_quantity', 'location', 'image']
+                  'quantity', 'min_quantity', 'reorder_quantity', 'location', 'image']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
         }
@@ -77,6 +79,32 @@ class ProductSearchForm(forms.Form):
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Список категорий берется из кэша, queryset нужен только для валидации
+        self.category_version = get_category_version()
+        category = self.fields['category']
+        category.choices = [('', category.empty_label)] + get_category_choices(self.category_version)
+
+    def filter_queryset(self, products):
+        """Применяет фильтры формы к queryset товаров (форма должна быть валидна)."""
+        query = self.cleaned_data.get('query')
+        category = self.cleaned_data.get('category')
+        in_stock = self.cleaned_data.get('in_stock')
+        low_stock = self.cleaned_data.get('low_stock')
+
+        if query:
+            products = products.filter(
+                Q(name__icontains=query) | Q(sku__icontains=query)
+            )
+        if category:
+            products = products.filter(category=category)
+        if in_stock:
+            products = products.filter(quantity__gt=0)
+        if low_stock:
+            products = products.filter(quantity__lte=F('min_quantity'))
+        return products
+
 
 class InvoiceGenerateForm(forms.Form):
     items = forms.CharField(
@@ -88,4 +116,29 @@ class InvoiceGenerateForm(forms.Form):
         items = self.cleaned_data.get('items')
         if not items:
             raise forms.ValidationError('Добавьте хотя бы один товар')
-        return items
\ No newline at end of file
+        return items
+
+
+class StocktakeForm(forms.ModelForm):
+    class Meta:
+        model = Stocktake
+        fields = ['comment']
+        widgets = {
+            'comment': forms.TextInput(attrs={'placeholder': 'Например: Годовая инвентаризация, зона А...'})
+        }
+
+
+class StocktakeUploadForm(forms.Form):
+    file = forms.FileField(
+        label='Файл с подсчетом',
+        help_text='CSV: артикул и фактическое количество через ";" или ","'
+    )
+
+
+class PickListForm(forms.Form):
+    invoices = forms.ModelMultipleChoiceField(
+        queryset=Invoice.objects.filter(picked_at__isnull=True),
+        label='Накладные',
+        error_messages={'required': 'Выберите хотя бы одну накладную'},
+        widget=forms.CheckboxSelectMultiple
+    )
@@ -0,0 +1,33 @@
+import re
+
+
+LOCATION_SEPARATORS = re.compile(r'[\s\-./,;:_]+')
+DIGITS = re.compile(r'\d+')
+
+
+def _natural(value):
+    # Числа дополняются нулями, чтобы "A2" сортировался раньше "A10"
+    return DIGITS.sub(lambda match: match.group().zfill(4), value)
+
+
+def parse_location(location):
+    """
+    Разбирает код места хранения на ключи (ряд, стеллаж, полка).
+
+    Поддерживаются коды вида "A-12-3", "A12.03.02", "B 4 2",
+    "Ряд A, стеллаж 3, полка 2": первая часть кода - ряд, стеллаж и полка -
+    первые числа в следующих частях. Неразобранные ключи равны ('', None, None).
+    """
+    parts = [part for part in LOCATION_SEPARATORS.split(location.strip().upper()) if part]
+    if not parts:
+        return '', None, None
+
+    aisle, rest = parts[0], parts[1:]
+    if not DIGITS.search(aisle) and rest and not DIGITS.search(rest[0]):
+        # "Ряд A ..." - слово-подпись перед кодом ряда
+        aisle, rest = rest[0], rest[1:]
+
+    numbers = [int(DIGITS.search(part).group()) for part in rest if DIGITS.search(part)]
+    rack = numbers[0] if numbers else None
+    shelf = numbers[1] if len(numbers) > 1 else None
+    return _natural(aisle)[:20], rack, shelf
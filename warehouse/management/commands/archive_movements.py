@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from warehouse.archive import archive_movements, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Переносит движения товаров старше N месяцев в сжатый архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=settings.MOVEMENT_RETENTION_MONTHS,
+            help='Сколько месяцев движений оставить в базе данных'
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=None,
+            help='Каталог архива (по умолчанию MOVEMENT_ARCHIVE_ROOT)'
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months должен быть не меньше 1')
+
+        cutoff = retention_cutoff(options['months'])
+        archived, balances = archive_movements(cutoff, options['archive_dir'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив движений: {archived}, '
+            f'создано входящих остатков: {balances} (граница {cutoff:%d.%m.%Y})'
+        ))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from warehouse.forecasting import update_replenishment
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает минимальный остаток и объем дозаказа по прогнозу расхода'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Глубина истории расхода в днях')
+        parser.add_argument('--method', choices=['ses', 'ma'], default='ses',
+                            help='ses - экспоненциальное сглаживание, ma - скользящее среднее')
+        parser.add_argument('--alpha', type=float, default=0.3, help='Коэффициент сглаживания для ses')
+        parser.add_argument('--window', type=int, default=28, help='Окно скользящего среднего в днях')
+        parser.add_argument('--lead-time', type=int, default=7, help='Срок поставки в днях')
+        parser.add_argument('--review-period', type=int, default=14, help='Период между заказами в днях')
+        parser.add_argument('--service-z', type=float, default=1.65,
+                            help='Коэффициент уровня обслуживания (1.65 ~ 95%%)')
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, не сохранять')
+
+    def handle(self, *args, **options):
+        if options['days'] < 7:
+            raise CommandError('--days должен быть не меньше 7')
+        if not 0 < options['alpha'] <= 1:
+            raise CommandError('--alpha должен быть в интервале (0, 1]')
+        if options['window'] < 1:
+            raise CommandError('--window должен быть не меньше 1')
+        if options['lead_time'] < 0 or options['review_period'] < 0:
+            raise CommandError('--lead-time и --review-period не могут быть отрицательными')
+
+        started = time.perf_counter()
+        processed, updated = update_replenishment(
+            days=options['days'],
+            dry_run=options['dry_run'],
+            method=options['method'],
+            alpha=options['alpha'],
+            window=options['window'],
+            lead_time=options['lead_time'],
+            review_period=options['review_period'],
+            service_z=options['service_z'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано товаров: {processed}, '
+            f'{"требуют" if options["dry_run"] else "обновлено"}: {updated} '
+            f'за {time.perf_counter() - started:.1f} с'
+        ))
@@ -0,0 +1,138 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Модули, которые воркер загружает при старте: на них действуют пороги
+STARTUP_MODULES = [
+    'warehouse_management.wsgi',
+    'warehouse_management.urls',
+]
+
+# Тяжелые зависимости, которых не должно быть в памяти после старта
+HEAVY_PACKAGES = ['reportlab', 'numpy', 'PIL']
+
+# Тяжелые модули выводятся только для сведения
+INFO_MODULES = [
+    'warehouse.forecasting',
+    'reportlab.platypus',
+    'PIL.Image',
+    'numpy',
+]
+
+# Выполняется в отдельном процессе: импорт в текущем процессе
+# не показателен, модули уже могут быть загружены
+PROFILE_SCRIPT = '''
+import json, os, sys, time
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+start, start_rss = time.perf_counter(), rss()
+import django
+django.setup()
+setup_time, setup_rss = time.perf_counter() - start, rss()
+modules = len(sys.modules)
+
+start = time.perf_counter()
+__import__(sys.argv[1])
+heavy = sys.argv[2].split(',')
+print(json.dumps({
+    'setup_time': setup_time,
+    'setup_rss': setup_rss - start_rss if start_rss is not None else None,
+    'time': time.perf_counter() - start,
+    'rss': rss() - setup_rss if setup_rss is not None else None,
+    'modules': len(sys.modules) - modules,
+    'heavy': sorted({name.split('.')[0] for name in sys.modules} & set(heavy)),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Показывает время импорта и прирост памяти (RSS) для модулей при старте воркера'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'modules',
+            nargs='*',
+            help='Модули для проверки вместо модулей старта воркера'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Число замеров, берется лучший')
+        parser.add_argument('--max-time', type=float, help='Допустимое время импорта модуля, мс')
+        parser.add_argument('--max-rss', type=float, help='Допустимый прирост RSS при импорте модуля, МБ')
+
+    def _measure(self, module, env):
+        result = subprocess.run(
+            [sys.executable, '-c', PROFILE_SCRIPT, module, ','.join(HEAVY_PACKAGES)],
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            error = result.stderr.strip().splitlines()
+            raise CommandError(f'Не удалось импортировать {module}: {error[-1] if error else result.returncode}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def _profile(self, modules, env, repeat):
+        results = {}
+        for module in modules:
+            runs = [self._measure(module, env) for _ in range(repeat)]
+            results[module] = min(runs, key=lambda run: run['time'])
+        return results
+
+    def _write_rows(self, results):
+        for module, run in results.items():
+            rss = f'{run["rss"] / 2 ** 20:8.1f}' if run['rss'] is not None else '       -'
+            self.stdout.write(f'{module:<32} {run["time"] * 1000:10.1f} {rss} {run["modules"]:8d}')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1')
+
+        env = {
+            **os.environ,
+            'PYTHONPATH': os.pathsep.join(path for path in sys.path if path),
+            # Прогрев исказил бы замер, он включается только на рабочих воркерах
+            'WAREHOUSE_PRELOAD_PDF': '0',
+        }
+        results = self._profile(options['modules'] or STARTUP_MODULES, env, options['repeat'])
+
+        baseline = min(results.values(), key=lambda run: run['setup_time'])
+        setup_rss = baseline['setup_rss']
+        self.stdout.write(f'{"Модуль":<32} {"Время, мс":>10} {"RSS, МБ":>8} {"Модулей":>8}')
+        self.stdout.write(
+            f'{"django.setup()":<32} {baseline["setup_time"] * 1000:10.1f} '
+            f'{f"{setup_rss / 2 ** 20:8.1f}" if setup_rss is not None else "       -"}'
+        )
+        self._write_rows(results)
+
+        if not options['modules']:
+            self.stdout.write('\nДля сведения (загружаются по требованию, пороги не действуют):')
+            self._write_rows(self._profile(INFO_MODULES, env, 1))
+
+        failures = []
+        for module, run in results.items():
+            time_ms = run['time'] * 1000
+            if options['max_time'] is not None and time_ms > options['max_time']:
+                failures.append(f'{module}: {time_ms:.1f} мс')
+            if options['max_rss'] is not None and run['rss'] is not None \
+                    and run['rss'] / 2 ** 20 > options['max_rss']:
+                failures.append(f'{module}: {run["rss"] / 2 ** 20:.1f} МБ')
+            if run['heavy']:
+                failures.append(f'{module} загружает {", ".join(run["heavy"])}')
+
+        if failures:
+            raise CommandError('Проверка не пройдена: ' + ', '.join(failures))
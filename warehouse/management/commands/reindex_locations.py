@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from warehouse.picking import reindex_locations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ключи места хранения (ряд, стеллаж, полка) для всех товаров'
+
+    def handle(self, *args, **options):
+        updated = reindex_locations()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено товаров: {updated}'))
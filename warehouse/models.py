@@ -3,10 +3,13 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from django.db.models import F
 
+from .locations import parse_location
+
 
 class Category(models.Model):
     name = models.CharField('Название', max_length=100)
     description = models.TextField('Описание', blank=True)
+    updated_at = models.DateTimeField('Дата обновления', auto_now=True)
 
     class Meta:
         verbose_name = 'Категория'
@@ -35,7 +38,20 @@ class Product(models.Model):
         default=0,
         help_text='При достижении этого количества товар подсвечивается'
     )
-    location = models.CharField('Местоположение', max_length=100, blank=True)
+    reorder_quantity = models.IntegerField(
+        'Объем дозаказа',
+        default=0,
+        help_text='Рекомендуемое количество для заказа у поставщика'
+    )
+    location = models.CharField(
+        'Местоположение',
+        max_length=100,
+        blank=True,
+        help_text='Код места хранения, например A-12-3 (ряд, стеллаж, полка)'
+    )
+    location_aisle = models.CharField('Ряд', max_length=20, blank=True, editable=False)
+    location_rack = models.IntegerField('Стеллаж', null=True, blank=True, editable=False)
+    location_shelf = models.IntegerField('Полка', null=True, blank=True, editable=False)
     image = models.ImageField('Изображение', upload_to='products/', blank=True, null=True)
     created_at = models.DateTimeField('Дата добавления', auto_now_add=True)
     updated_at = models.DateTimeField('Дата обновления', auto_now=True)
@@ -54,11 +70,22 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['sku']),
             models.Index(fields=['name']),
+            models.Index(fields=['location_aisle', 'location_rack', 'location_shelf']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
 
+    def save(self, *args, **kwargs):
+        # Ключи маршрута сборки всегда соответствуют текущему коду места
+        self.location_aisle, self.location_rack, self.location_shelf = parse_location(self.location)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'location' in update_fields:
+            kwargs['update_fields'] = {
+                *update_fields, 'location_aisle', 'location_rack', 'location_shelf'
+            }
+        super().save(*args, **kwargs)
+
     def is_low_stock(self):
         return self.quantity <= self.min_quantity
 
@@ -88,11 +115,34 @@ class StockMovement(models.Model):
         null=True,
         verbose_name='Пользователь'
     )
+    is_opening_balance = models.BooleanField(
+        'Входящий остаток',
+        default=False,
+        help_text='Свернутый итог движений, перенесенных в архив'
+    )
+    is_stocktake_adjustment = models.BooleanField(
+        'Корректировка инвентаризации',
+        default=False,
+        help_text='Движение на расхождение, созданное при проведении инвентаризации'
+    )
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='Ключ сканера, по которому отбрасываются повторные отправки'
+    )
 
     class Meta:
         verbose_name = 'Движение товара'
         verbose_name_plural = 'Движения товаров'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['product', '-created_at']),
+        ]
 
     def __str__(self):
         return f"{self.get_movement_type_display()}: {self.product.name} ({self.quantity})"
@@ -116,6 +166,12 @@ class Invoice(models.Model):
         verbose_name='Создал'
     )
     pdf_file = models.FileField('PDF файл', upload_to='invoices/', blank=True, null=True)
+    picked_at = models.DateTimeField(
+        'Дата сборки',
+        null=True,
+        blank=True,
+        help_text='Пусто, пока накладная не собрана по листу сборки'
+    )
 
     class Meta:
         verbose_name = 'Накладная'
@@ -125,6 +181,10 @@ class Invoice(models.Model):
     def __str__(self):
         return f"Накладная №{self.number} от {self.created_at.strftime('%d.%m.%Y')}"
 
+    @property
+    def is_picked(self):
+        return self.picked_at is not None
+
 
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(
@@ -146,4 +206,62 @@ class InvoiceItem(models.Model):
         verbose_name_plural = 'Позиции накладной'
 
     def get_total(self):
-        return self.price * self.quantity
\ No newline at end of file
+        return self.price * self.quantity
+
+class Stocktake(models.Model):
+    STATUSES = [
+        ('open', 'Открыта'),
+        ('applied', 'Проведена'),
+        ('cancelled', 'Отменена'),
+    ]
+
+    status = models.CharField('Статус', max_length=10, choices=STATUSES, default='open')
+    comment = models.CharField('Комментарий', max_length=200, blank=True)
+    created_at = models.DateTimeField('Дата открытия', auto_now_add=True)
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name='Открыл'
+    )
+    applied_at = models.DateTimeField('Дата проведения', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Инвентаризация'
+        verbose_name_plural = 'Инвентаризации'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Инвентаризация №{self.pk} от {self.created_at.strftime('%d.%m.%Y')}"
+
+    @property
+    def is_open(self):
+        return self.status == 'open'
+
+
+class StocktakeLine(models.Model):
+    stocktake = models.ForeignKey(
+        Stocktake,
+        on_delete=models.CASCADE,
+        related_name='lines',
+        verbose_name='Инвентаризация'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        verbose_name='Товар'
+    )
+    expected_quantity = models.IntegerField('Учетное количество')
+    counted_quantity = models.IntegerField('Фактическое количество', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Строка инвентаризации'
+        verbose_name_plural = 'Строки инвентаризации'
+        constraints = [
+            models.UniqueConstraint(fields=['stocktake', 'product'], name='unique_stocktake_product'),
+        ]
+
+    def get_difference(self):
+        if self.counted_quantity is None:
+            return 0
+        return self.counted_quantity - self.expected_quantity
@@ -0,0 +1,97 @@
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .locations import parse_location
+from .models import Invoice, InvoiceItem, Product
+
+
+def get_pick_list(invoice_ids):
+    """
+    Сводный лист сборки по накладным в порядке обхода склада.
+
+    Позиции всех накладных суммируются по товару одним сгруппированным
+    запросом, отсортированным по ключам места хранения. Ряды проходятся
+    змейкой: в каждом втором ряду стеллажи идут в обратном порядке.
+    Товары без разобранного места идут в конце листа.
+    """
+    rows = InvoiceItem.objects.filter(
+        invoice_id__in=invoice_ids
+    ).values(
+        'product_id',
+        'product__sku',
+        'product__name',
+        'product__location',
+        'product__location_aisle',
+        'product__location_rack',
+        'product__location_shelf',
+    ).annotate(
+        quantity=Sum('quantity'),
+        invoice_count=Count('invoice_id', distinct=True),
+    ).order_by(
+        'product__location_aisle',
+        'product__location_rack',
+        'product__location_shelf',
+        'product__sku',
+    )
+
+    located, unlocated = [], []
+    for row in rows:
+        (located if row['product__location_aisle'] else unlocated).append({
+            'product_id': row['product_id'],
+            'sku': row['product__sku'],
+            'name': row['product__name'],
+            'location': row['product__location'],
+            'aisle': row['product__location_aisle'],
+            'quantity': row['quantity'],
+            'invoice_count': row['invoice_count'],
+        })
+
+    route = []
+    for number, (aisle, aisle_rows) in enumerate(groupby(located, key=lambda row: row['aisle'])):
+        aisle_rows = list(aisle_rows)
+        if number % 2:
+            aisle_rows.reverse()
+        route.extend(aisle_rows)
+    route.extend(unlocated)
+
+    for step, row in enumerate(route, 1):
+        row['step'] = step
+    return route
+
+
+def mark_picked(invoice_ids):
+    """Отмечает открытые накладные собранными. Возвращает их количество."""
+    return Invoice.objects.filter(
+        pk__in=invoice_ids, picked_at__isnull=True
+    ).update(picked_at=timezone.now())
+
+
+def reindex_locations(batch_size=500):
+    """
+    Пересчитывает ключи места хранения для всех товаров.
+
+    Нужен для товаров, сохраненных до появления ключей или измененных
+    через update(). Товары группируются по ключам, и на группу
+    выполняется один UPDATE. Возвращает число изменившихся товаров.
+    """
+    groups = {}
+    for pk, location, aisle, rack, shelf in Product.objects.values_list(
+        'pk', 'location', 'location_aisle', 'location_rack', 'location_shelf'
+    ).iterator(chunk_size=5000):
+        keys = parse_location(location)
+        if keys != (aisle, rack, shelf):
+            groups.setdefault(keys, []).append(pk)
+
+    with transaction.atomic():
+        for (aisle, rack, shelf), ids in groups.items():
+            for start in range(0, len(ids), batch_size):
+                Product.objects.filter(pk__in=ids[start:start + batch_size]).update(
+                    location_aisle=aisle,
+                    location_rack=rack,
+                    location_shelf=shelf,
+                )
+
+    return sum(len(ids) for ids in groups.values())
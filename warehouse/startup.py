@@ -0,0 +1,23 @@
+from importlib import import_module
+
+
+PDF_MODULES = [
+    'reportlab.lib.colors',
+    'reportlab.lib.pagesizes',
+    'reportlab.lib.styles',
+    'reportlab.lib.units',
+    'reportlab.platypus',
+]
+
+
+def preload_pdf():
+    """
+    Прогрев воркера, который генерирует PDF: импортирует ReportLab
+    и собирает пустой лист сборки в памяти, чтобы загрузка шрифтов
+    и стилей не приходилась на первый запрос.
+    """
+    for module in PDF_MODULES:
+        import_module(module)
+
+    from .utils import generate_pick_list_pdf
+    generate_pick_list_pdf([], [])
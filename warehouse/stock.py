@@ -0,0 +1,110 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Product, StockMovement
+
+
+def apply_quantity_deltas(deltas, batch_size=500):
+    """
+    Изменяет остатки товаров на заданные величины {product_id: delta}.
+
+    Товары группируются по величине изменения, и на каждую группу
+    выполняется один UPDATE: различных величин обычно немного,
+    а CASE по тысячам товаров дорого собирать в ORM.
+    updated_at обновляется явно, так как update() не трогает auto_now,
+    а по нему сбрасываются кэш строк списка товаров и ETag.
+    """
+    by_delta = defaultdict(list)
+    for product_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(product_id)
+
+    now = timezone.now()
+    for delta, product_ids in by_delta.items():
+        for start in range(0, len(product_ids), batch_size):
+            Product.objects.filter(pk__in=product_ids[start:start + batch_size]).update(
+                quantity=F('quantity') + delta,
+                updated_at=now,
+            )
+
+
+def apply_scan_batch(scans, user, default_reason='Сканирование'):
+    """
+    Проводит пачку сканов {'key', 'sku', 'type', 'quantity'[, 'reason']}.
+
+    Артикулы разрешаются одним запросом, количества суммируются по товару
+    и применяются пакетными UPDATE, движения создаются через bulk_create.
+    Сканы с уже проведенным ключом считаются дублями и пропускаются.
+    Если итоговый расход по товару больше остатка, отклоняются все
+    сканы этого товара. Возвращает (accepted, duplicates, rejected).
+    """
+    unique_scans = {}
+    duplicates = []
+    for scan in scans:
+        if scan['key'] in unique_scans:
+            duplicates.append(scan['key'])
+        else:
+            unique_scans[scan['key']] = scan
+
+    with transaction.atomic():
+        processed = set(StockMovement.objects.filter(
+            idempotency_key__in=list(unique_scans)
+        ).values_list('idempotency_key', flat=True))
+        duplicates.extend(processed)
+        pending = [scan for key, scan in unique_scans.items() if key not in processed]
+
+        # Строки блокируются в порядке id, чтобы пересекающиеся пачки
+        # не ждали друг друга по кругу
+        products = {
+            sku: (product_id, quantity)
+            for sku, product_id, quantity in Product.objects.select_for_update().filter(
+                sku__in={scan['sku'] for scan in pending}
+            ).order_by('pk').values_list('sku', 'id', 'quantity')
+        }
+
+        rejected = []
+        by_product = defaultdict(list)
+        for scan in pending:
+            if scan['sku'] not in products:
+                rejected.append({'key': scan['key'], 'sku': scan['sku'], 'error': 'Product not found'})
+            else:
+                by_product[products[scan['sku']][0]].append(scan)
+
+        deltas = {}
+        movements = []
+        for sku, (product_id, quantity) in products.items():
+            product_scans = by_product.get(product_id)
+            if not product_scans:
+                continue
+            delta = sum(
+                scan['quantity'] if scan['type'] == 'in' else -scan['quantity']
+                for scan in product_scans
+            )
+            if quantity + delta < 0:
+                rejected.extend(
+                    {'key': scan['key'], 'sku': sku, 'error': f'Insufficient stock: {quantity} available'}
+                    for scan in product_scans
+                )
+                continue
+
+            deltas[product_id] = delta
+            movements.extend(
+                StockMovement(
+                    product_id=product_id,
+                    movement_type=scan['type'],
+                    quantity=scan['quantity'],
+                    reason=scan.get('reason') or default_reason,
+                    created_by=user,
+                    idempotency_key=scan['key'],
+                )
+                for scan in product_scans
+            )
+
+        # bulk_create не вызывает StockMovement.save, остатки меняет apply_quantity_deltas
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+        apply_quantity_deltas(deltas)
+
+    return len(movements), duplicates, rejected
@@ -0,0 +1,214 @@
+import csv
+import io
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum, Q, F, Value, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Product, StockMovement, Stocktake, StocktakeLine
+
+
+BATCH_SIZE = 5000
+
+
+class StocktakeError(Exception):
+    pass
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def open_stocktake(user, comment=''):
+    """
+    Открывает инвентаризацию и фиксирует учетные остатки всех товаров.
+
+    Расхождения считаются от этого снимка, поэтому движения,
+    проведенные во время подсчета, при проведении не теряются.
+    """
+    with transaction.atomic():
+        stocktake = Stocktake.objects.create(created_by=user, comment=comment)
+        # Снимок копируется одним INSERT ... SELECT без создания объектов модели
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {_table(StocktakeLine)} (stocktake_id, product_id, expected_quantity) '
+                f'SELECT %s, id, quantity FROM {_table(Product)}',
+                [stocktake.pk]
+            )
+    return stocktake
+
+
+def parse_counts_csv(file):
+    """
+    Читает файл со строками "артикул;количество" (или через запятую).
+    Первая строка пропускается, если в ней заголовок.
+    """
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        first_line = text.readline()
+        delimiter = ';' if ';' in first_line else ','
+        reader = csv.reader(
+            (line for lines in ([first_line], text) for line in lines),
+            delimiter=delimiter
+        )
+
+        for line_number, row in enumerate(reader, 1):
+            if not row or not row[0].strip():
+                continue
+            if len(row) < 2:
+                raise StocktakeError(f'Строка {line_number}: ожидается артикул и количество')
+            sku, quantity = row[0].strip(), row[1].strip()
+            try:
+                quantity = int(quantity)
+            except ValueError:
+                if line_number == 1:
+                    continue
+                raise StocktakeError(f'Строка {line_number}: неверное количество "{quantity}"')
+            if quantity < 0:
+                raise StocktakeError(f'Строка {line_number}: количество не может быть отрицательным')
+            yield sku, quantity
+    except UnicodeDecodeError:
+        raise StocktakeError('Файл должен быть в кодировке UTF-8')
+
+
+def record_counts(stocktake, counts):
+    """
+    Записывает фактические количества из пар (артикул, количество).
+
+    Повторы артикула в одной загрузке суммируются (подсчет по зонам),
+    повторная загрузка артикула заменяет прежнее значение.
+    Возвращает (число записанных строк, неизвестные артикулы).
+    """
+    if not stocktake.is_open:
+        raise StocktakeError('Инвентаризация уже закрыта')
+
+    totals = defaultdict(int)
+    for sku, quantity in counts:
+        totals[sku] += quantity
+
+    lines = StocktakeLine.objects.filter(stocktake=stocktake)
+    if len(totals) > BATCH_SIZE:
+        # Для большой загрузки весь снимок читается одним запросом,
+        # это быстрее, чем искать артикулы пачками через IN
+        product_ids = dict(lines.values_list('product__sku', 'product_id'))
+    else:
+        product_ids = dict(lines.filter(product__sku__in=list(totals)).values_list('product__sku', 'product_id'))
+
+    found = [(sku, product_ids[sku]) for sku in totals if sku in product_ids]
+    unknown = [sku for sku in totals if sku not in product_ids]
+    with transaction.atomic():
+        # Блокировка не дает записать подсчет в параллельно проводимую инвентаризацию
+        stocktake = Stocktake.objects.select_for_update().get(pk=stocktake.pk)
+        if not stocktake.is_open:
+            raise StocktakeError('Инвентаризация уже закрыта')
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {_table(StocktakeLine)} SET counted_quantity = %s '
+                f'WHERE stocktake_id = %s AND product_id = %s',
+                [(totals[sku], stocktake.pk, product_id) for sku, product_id in found]
+            )
+
+    return len(found), unknown
+
+
+def get_differences(stocktake):
+    return stocktake.lines.filter(
+        counted_quantity__isnull=False
+    ).exclude(
+        counted_quantity=F('expected_quantity')
+    ).annotate(
+        difference=F('counted_quantity') - F('expected_quantity')
+    )
+
+
+def get_summary(stocktake):
+    differences = get_differences(stocktake)
+    summary = stocktake.lines.aggregate(
+        total=Count('id'),
+        counted=Count('id', filter=Q(counted_quantity__isnull=False)),
+    )
+    summary.update(differences.aggregate(
+        differences=Count('id'),
+        surplus=Sum('difference', filter=Q(difference__gt=0)),
+        shortage=Sum('difference', filter=Q(difference__lt=0)),
+    ))
+    return summary
+
+
+def cancel_stocktake(stocktake):
+    updated = Stocktake.objects.filter(pk=stocktake.pk, status='open').update(status='cancelled')
+    if not updated:
+        raise StocktakeError('Инвентаризация уже закрыта')
+
+
+def apply_stocktake(stocktake, user):
+    """
+    Проводит инвентаризацию: создает движения на все расхождения
+    и меняет остатки одной транзакцией. Непосчитанные товары
+    не корректируются, остаток после корректировки не меньше нуля.
+    """
+    with transaction.atomic():
+        stocktake = Stocktake.objects.select_for_update().get(pk=stocktake.pk)
+        if not stocktake.is_open:
+            raise StocktakeError('Инвентаризация уже закрыта')
+
+        differences = get_differences(stocktake)
+        now = timezone.now()
+
+        # Остатки меняются и движениями во время подсчета, поэтому товары
+        # блокируются (в порядке id, чтобы не было взаимоблокировок)
+        # до расчета корректировок
+        list(Product.objects.select_for_update().filter(
+            pk__in=differences.values('product_id')
+        ).order_by('pk').values_list('pk', flat=True))
+
+        # Корректировка не опускает остаток ниже нуля: если после снимка
+        # был расход, списывается только то, что осталось на учете
+        adjustment = (
+            'CASE WHEN d.counted_quantity - d.expected_quantity < -p.quantity '
+            'THEN -p.quantity ELSE d.counted_quantity - d.expected_quantity END'
+        )
+
+        # Движения создаются одним INSERT ... SELECT по строкам с расхождениями
+        sql, params = differences.values(
+            'product_id', 'counted_quantity', 'expected_quantity'
+        ).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {_table(StockMovement)} '
+                f'(product_id, movement_type, quantity, reason, created_at, created_by_id, '
+                f'is_opening_balance, is_stocktake_adjustment) '
+                f"SELECT d.product_id, CASE WHEN d.counted_quantity > d.expected_quantity THEN 'in' ELSE 'out' END, "
+                f'ABS({adjustment}), %s, %s, %s, %s, %s '
+                f'FROM ({sql}) d INNER JOIN {_table(Product)} p ON p.id = d.product_id '
+                f'WHERE {adjustment} <> 0',
+                [
+                    f'Инвентаризация №{stocktake.pk}',
+                    connection.ops.adapt_datetimefield_value(now),
+                    user.pk,
+                    False,
+                    True,
+                    *params,
+                ]
+            )
+            adjusted = cursor.rowcount
+
+        Product.objects.filter(
+            pk__in=differences.values('product_id')
+        ).update(
+            quantity=Greatest(
+                F('quantity') + Subquery(
+                    differences.filter(product=OuterRef('pk')).values('difference')[:1]
+                ),
+                Value(0)
+            ),
+            updated_at=now,
+        )
+
+        stocktake.status = 'applied'
+        stocktake.applied_at = timezone.now()
+        stocktake.save(update_fields=['status', 'applied_at'])
+
+    return adjusted
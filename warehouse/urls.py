@@ -21,6 +21,17 @@ urlpatterns = [
     path('invoice/generate/', views.invoice_generate, name='invoice_generate'),
     path('invoice/<int:pk>/download/', views.invoice_download_pdf, name='invoice_download_pdf'),
 
+    path('picking/', views.pick_list, name='pick_list'),
+    path('picking/complete/', views.pick_list_complete, name='pick_list_complete'),
+
+    path('stocktakes/', views.stocktake_list, name='stocktake_list'),
+    path('stocktake/<int:pk>/', views.stocktake_detail, name='stocktake_detail'),
+    path('stocktake/<int:pk>/apply/', views.stocktake_apply, name='stocktake_apply'),
+    path('stocktake/<int:pk>/cancel/', views.stocktake_cancel, name='stocktake_cancel'),
+
+    path('api/products/', views.api_products, name='api_products'),
     path('api/product-search/', views.api_product_search, name='api_product_search'),
     path('api/product-stock/<int:product_id>/', views.api_product_stock, name='api_product_stock'),
+    path('api/movements/batch/', views.api_movement_batch, name='api_movement_batch'),
+    path('api/stocktake/<int:pk>/counts/', views.api_stocktake_counts, name='api_stocktake_counts'),
 ]
\ No newline at end of file
@@ -1,14 +1,17 @@
 import os
 from datetime import datetime
+from io import BytesIO
 from django.conf import settings
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.units import mm
+from django.utils.html import escape
 
 
 def generate_invoice_pdf(invoice, items_data):
+    # ReportLab импортируется при первой генерации PDF, а не при старте воркера
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.units import mm
 
     pdf_dir = os.path.join(settings.MEDIA_ROOT, 'invoices')
     os.makedirs(pdf_dir, exist_ok=True)
@@ -91,6 +94,60 @@ def generate_invoice_pdf(invoice, items_data):
     return filepath
 
 
+def generate_pick_list_pdf(rows, invoices):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.units import mm
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=15 * mm,
+        leftMargin=15 * mm,
+        topMargin=15 * mm,
+        bottomMargin=15 * mm
+    )
+
+    styles = getSampleStyleSheet()
+    elements = [
+        Paragraph("Лист сборки", styles['Heading1']),
+        Paragraph(f"Сформирован: {datetime.now().strftime('%d.%m.%Y %H:%M')}", styles['Normal']),
+        Paragraph("Накладные: " + ', '.join(invoice.number for invoice in invoices), styles['Normal']),
+        Spacer(1, 5 * mm),
+    ]
+
+    table_data = [['№', 'Место', 'Артикул', 'Наименование', 'Кол-во', 'Накл.', 'Отм.']]
+    for row in rows:
+        table_data.append([
+            str(row['step']),
+            row['location'] or '-',
+            row['sku'],
+            Paragraph(escape(row['name']), styles['Normal']),
+            str(row['quantity']),
+            str(row['invoice_count']),
+            '',
+        ])
+
+    table = Table(table_data, colWidths=[25, 65, 70, 200, 40, 35, 30], repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (3, 1), (3, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ]))
+    elements.append(table)
+    elements.append(Spacer(1, 10 * mm))
+    elements.append(Paragraph("Собрал: ____________________", styles['Normal']))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
 def generate_invoice_number():
     from .models import Invoice
 
@@ -2,17 +2,38 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, F
+from django.conf import settings
+from django.db.models import Q, F, Max, Sum
+from django.db.models.functions import Abs
 from django.core.paginator import Paginator
-from django.http import JsonResponse, FileResponse
+from django.http import JsonResponse, FileResponse, HttpResponse
+from django.utils.cache import quote_etag
+from django.utils.http import content_disposition_header
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.views.decorators.http import condition, require_POST
+import hashlib
 import json
-from .models import Product, Category, StockMovement, Invoice, InvoiceItem
+import re
+from decimal import Decimal
+from .models import Product, Category, StockMovement, Invoice, InvoiceItem, Stocktake
 from .forms import (
     UserRegisterForm, ProductForm, StockMovementForm,
-    ProductSearchForm, InvoiceGenerateForm
+    ProductSearchForm, InvoiceGenerateForm, StocktakeForm, StocktakeUploadForm,
+    PickListForm
 )
 from .decorators import admin_required
-from .utils import generate_invoice_pdf, generate_invoice_number
+from .caching import get_category_version
+from .stock import apply_scan_batch
+from .picking import get_pick_list, mark_picked
+from .stocktake import (
+    StocktakeError, open_stocktake, parse_counts_csv, record_counts,
+    get_differences, get_summary, apply_stocktake, cancel_stocktake
+)
+from .utils import generate_invoice_pdf, generate_pick_list_pdf, generate_invoice_number
 
 
 def register_view(request):
@@ -48,6 +69,91 @@ def logout_view(request):
     return redirect('warehouse:login')
 
 
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _has_pending_messages(request):
+    # Ответ 304 не отрисует шаблон, и сообщения не будут показаны
+    return len(messages.get_messages(request)) > 0
+
+
+def _user_etag(request, *parts):
+    # Страница содержит {% csrf_token %}, а login() меняет CSRF-секрет:
+    # без него в ETag клиент получил бы 304 с устаревшим токеном формы
+    csrf_secret = request.META.get('CSRF_COOKIE', '')
+    csrf_part = hashlib.sha256(csrf_secret.encode()).hexdigest()[:16] if csrf_secret else ''
+    return ':'.join(str(part) for part in (*parts, request.user.pk, int(request.user.is_staff), csrf_part))
+
+
+def _product_etag(request, pk):
+    if _has_pending_messages(request):
+        return None
+    updated_at = Product.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at:
+        # Страница выводит название категории, переименование меняет версию
+        return _user_etag(request, 'product', pk, updated_at.timestamp(), get_category_version())
+
+
+def _invoice_etag(request, pk):
+    if _has_pending_messages(request):
+        return None
+    # Накладная не меняется после создания, но в ней выводятся
+    # текущие названия и артикулы товаров
+    state = Invoice.objects.filter(pk=pk).annotate(
+        products_updated_at=Max('items__product__updated_at')
+    ).values_list('number', 'pdf_file', 'products_updated_at').first()
+    if state:
+        number, pdf_file, products_updated_at = state
+        return _user_etag(
+            request, 'invoice', number, pdf_file,
+            products_updated_at.timestamp() if products_updated_at else ''
+        )
+
+
+def _invoice_pdf_etag(request, pk):
+    state = Invoice.objects.filter(pk=pk).values_list('number', 'pdf_file').first()
+    if state and state[1]:
+        return 'invoice-pdf:{}:{}'.format(*state)
+
+
+def _invoice_pdf_last_modified(request, pk):
+    return Invoice.objects.filter(pk=pk).exclude(pdf_file='').exclude(
+        pdf_file__isnull=True
+    ).values_list('created_at', flat=True).first()
+
+
+def _ranged_file_response(request, file, filename, etag):
+    size = file.size
+    match = RANGE_RE.match(request.META.get('HTTP_RANGE', ''))
+    if_range = request.META.get('HTTP_IF_RANGE')
+
+    if match and any(match.groups()) and (not if_range or if_range == quote_etag(etag)):
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+
+        if start > end or start >= size:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+        with file.open('rb') as f:
+            f.seek(start)
+            data = f.read(end - start + 1)
+        response = HttpResponse(data, status=206, content_type='application/pdf')
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    else:
+        response = FileResponse(file.open('rb'), as_attachment=True, filename=filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
 # Товары
 @login_required
 def product_list(request):
@@ -55,38 +161,28 @@ def product_list(request):
     products = Product.objects.select_related('category', 'created_by').all()
 
     if form.is_valid():
-        query = form.cleaned_data.get('query')
-        category = form.cleaned_data.get('category')
-        in_stock = form.cleaned_data.get('in_stock')
-        low_stock = form.cleaned_data.get('low_stock')
-
-        if query:
-            products = products.filter(
-                Q(name__icontains=query) | Q(sku__icontains=query)
-            )
-        if category:
-            products = products.filter(category=category)
-        if in_stock:
-            products = products.filter(quantity__gt=0)
-        if low_stock:
-            products = products.filter(quantity__lte=F('min_quantity'))
+        products = form.filter_queryset(products)
 
     paginator = Paginator(products, 20)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    total_value = sum(p.get_total_value() for p in products)
+    total_value = products.aggregate(total=Sum(F('price') * F('quantity')))['total'] or 0
 
     context = {
         'page_obj': page_obj,
         'form': form,
-        'total_products': products.count(),
+        'total_products': paginator.count,
         'total_value': total_value,
+        'category_version': form.category_version,
+        'fragment_cache_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, 'warehouse/product_list.html', context)
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_product_etag)
 def product_detail(request, pk):
     product = get_object_or_404(Product.objects.select_related('category'), pk=pk)
     movements = StockMovement.objects.filter(product=product).select_related('created_by')[:10]
@@ -188,6 +284,8 @@ def invoice_list(request):
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_invoice_etag)
 def invoice_detail(request, pk):
     invoice = get_object_or_404(
         Invoice.objects.prefetch_related('items__product'),
@@ -265,20 +363,60 @@ def invoice_generate(request):
 
 
 @login_required
+@condition(etag_func=_invoice_pdf_etag, last_modified_func=_invoice_pdf_last_modified)
 def invoice_download_pdf(request, pk):
     invoice = get_object_or_404(Invoice, pk=pk)
 
     if invoice.pdf_file:
-        return FileResponse(
-            invoice.pdf_file.open('rb'),
-            as_attachment=True,
-            filename=f'invoice_{invoice.number}.pdf'
+        response = _ranged_file_response(
+            request,
+            invoice.pdf_file,
+            f'invoice_{invoice.number}.pdf',
+            'invoice-pdf:{}:{}'.format(invoice.number, invoice.pdf_file.name)
         )
+        # PDF накладной не меняется после создания
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response
     else:
         messages.error(request, 'PDF файл не найден')
         return redirect('warehouse:invoice_detail', pk=pk)
 
 
+@login_required
+def pick_list(request):
+    form = PickListForm(request.GET or None)
+    rows = None
+    invoices = []
+    if form.is_valid():
+        invoices = form.cleaned_data['invoices']
+        rows = get_pick_list([invoice.pk for invoice in invoices])
+
+        if request.GET.get('format') == 'pdf':
+            response = HttpResponse(generate_pick_list_pdf(rows, invoices), content_type='application/pdf')
+            response['Content-Disposition'] = content_disposition_header(
+                False, f"pick_list_{timezone.localtime():%Y%m%d_%H%M}.pdf"
+            )
+            return response
+
+    return render(request, 'warehouse/pick_list.html', {
+        'form': form,
+        'rows': rows,
+        'invoices': invoices,
+    })
+
+
+@login_required
+@require_POST
+def pick_list_complete(request):
+    invoice_ids = [pk for pk in request.POST.getlist('invoices') if pk.isdigit()]
+    picked = mark_picked(invoice_ids)
+    if picked:
+        messages.success(request, f'Собрано накладных: {picked}')
+    else:
+        messages.error(request, 'Накладные уже собраны')
+    return redirect('warehouse:pick_list')
+
+
 @login_required
 def api_product_search(request):
     query = request.GET.get('q', '')
@@ -301,6 +439,86 @@ def api_product_search(request):
 
     return JsonResponse(data, safe=False)
 
+# Поля, доступные в api_products: имя в ответе -> поле или выражение для values()
+PRODUCT_API_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'sku': 'sku',
+    'category_name': F('category__name'),
+    'category_id': 'category_id',
+    'price': 'price',
+    'quantity': 'quantity',
+    'min_quantity': 'min_quantity',
+    'reorder_quantity': 'reorder_quantity',
+    'location': 'location',
+    'updated_at': 'updated_at',
+}
+PRODUCT_API_DEFAULT_FIELDS = ['id', 'name', 'sku', 'category_name', 'price', 'quantity']
+
+
+class ProductAPIEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # Цены отдаются числом, как в остальных API
+        if isinstance(o, Decimal):
+            return float(o)
+        return super().default(o)
+
+
+def _parse_positive_int(value, default):
+    if value in (None, ''):
+        return default
+    if not value.isdigit():
+        return None
+    return int(value)
+
+
+@login_required
+@gzip_page
+def api_products(request):
+    """
+    Список товаров для мобильных клиентов.
+
+    Строки читаются через values() без создания объектов модели.
+    Параметры: fields - поля через запятую (id возвращается всегда),
+    фильтры ProductSearchForm, after - курсор (id последнего полученного
+    товара, в ответе - next), limit - размер страницы.
+    """
+    fields = request.GET.get('fields')
+    fields = fields.split(',') if fields else PRODUCT_API_DEFAULT_FIELDS
+    unknown = [field for field in fields if field not in PRODUCT_API_FIELDS]
+    if unknown:
+        return JsonResponse({'error': f'Unknown fields: {", ".join(unknown)}'}, status=400)
+
+    after = _parse_positive_int(request.GET.get('after'), 0)
+    limit = _parse_positive_int(request.GET.get('limit'), settings.PRODUCT_API_PAGE_SIZE)
+    if after is None or not limit:
+        return JsonResponse({'error': 'after and limit must be positive integers'}, status=400)
+    limit = min(limit, settings.PRODUCT_API_MAX_PAGE_SIZE)
+
+    form = ProductSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors}, status=400)
+
+    # id нужен для курсора и возвращается всегда
+    expressions = {field: PRODUCT_API_FIELDS[field] for field in ['id', *fields]}
+    values = [field for field, expression in expressions.items() if isinstance(expression, str)]
+    aliases = {field: expression for field, expression in expressions.items() if not isinstance(expression, str)}
+
+    # Курсор по id: следующая страница читается по индексу без OFFSET
+    rows = list(
+        form.filter_queryset(Product.objects.filter(pk__gt=after))
+        .order_by('pk')
+        .values(*values, **aliases)[:limit + 1]
+    )
+    next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+
+    return JsonResponse(
+        {'results': rows[:limit], 'next': next_cursor},
+        encoder=ProductAPIEncoder,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False},
+    )
+
+
 @login_required
 def api_product_stock(request, product_id):
     try:
@@ -312,4 +530,170 @@ def api_product_stock(request, product_id):
             'price': float(product.price)
         })
     except Product.DoesNotExist:
-        return JsonResponse({'error': 'Product not found'}, status=404)
\ No newline at end of file
+        return JsonResponse({'error': 'Product not found'}, status=404)
+
+
+def _parse_scans(payload):
+    scans = payload.get('scans') if isinstance(payload, dict) else None
+    if not isinstance(scans, list) or not scans:
+        return None, 'Expected {"scans": [...]} with at least one scan'
+    if len(scans) > settings.SCAN_BATCH_MAX_SIZE:
+        return None, f'Batch is limited to {settings.SCAN_BATCH_MAX_SIZE} scans'
+
+    for idx, scan in enumerate(scans):
+        if not isinstance(scan, dict):
+            return None, f'Scan {idx}: expected an object'
+        key, sku, quantity = scan.get('key'), scan.get('sku'), scan.get('quantity')
+        if not isinstance(key, str) or not 0 < len(key) <= 64:
+            return None, f'Scan {idx}: key must be a string of 1-64 characters'
+        if not isinstance(sku, str) or not sku:
+            return None, f'Scan {idx}: sku is required'
+        if scan.get('type') not in ('in', 'out'):
+            return None, f'Scan {idx}: type must be "in" or "out"'
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+            return None, f'Scan {idx}: quantity must be a positive integer'
+        if not isinstance(scan.get('reason', ''), str):
+            return None, f'Scan {idx}: reason must be a string'
+        scan['reason'] = scan.get('reason', '')[:200]
+    return scans, None
+
+
+@login_required
+@require_POST
+def api_movement_batch(request):
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    scans, error = _parse_scans(payload)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+
+    try:
+        accepted, duplicates, rejected = apply_scan_batch(scans, request.user)
+    except IntegrityError:
+        # Тот же ключ одновременно провел другой запрос, повтор пачки вернет его как дубль
+        return JsonResponse({'error': 'Concurrent batch with the same keys, retry'}, status=409)
+
+    return JsonResponse({
+        'accepted': accepted,
+        'duplicates': duplicates,
+        'rejected': rejected,
+    })
+
+
+# Инвентаризация
+@admin_required
+def stocktake_list(request):
+    if request.method == 'POST':
+        form = StocktakeForm(request.POST)
+        if form.is_valid():
+            stocktake = open_stocktake(request.user, form.cleaned_data['comment'])
+            messages.success(request, f'Инвентаризация №{stocktake.pk} открыта, остатки зафиксированы')
+            return redirect('warehouse:stocktake_detail', pk=stocktake.pk)
+    else:
+        form = StocktakeForm()
+
+    stocktakes = Stocktake.objects.select_related('created_by').all()
+    paginator = Paginator(stocktakes, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    return render(request, 'warehouse/stocktake_list.html', {
+        'form': form,
+        'page_obj': page_obj,
+    })
+
+
+@admin_required
+def stocktake_detail(request, pk):
+    stocktake = get_object_or_404(Stocktake.objects.select_related('created_by'), pk=pk)
+
+    if request.method == 'POST':
+        form = StocktakeUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                recorded, unknown = record_counts(
+                    stocktake, parse_counts_csv(form.cleaned_data['file'].file)
+                )
+            except StocktakeError as e:
+                messages.error(request, str(e))
+            else:
+                messages.success(request, f'Загружено позиций: {recorded}')
+                if unknown:
+                    messages.warning(
+                        request,
+                        f'Артикулы не найдены ({len(unknown)}): {", ".join(unknown[:20])}'
+                    )
+            return redirect('warehouse:stocktake_detail', pk=pk)
+    else:
+        form = StocktakeUploadForm()
+
+    differences = get_differences(stocktake).select_related('product').annotate(
+        abs_difference=Abs('difference')
+    ).order_by('-abs_difference')[:100]
+
+    return render(request, 'warehouse/stocktake_detail.html', {
+        'stocktake': stocktake,
+        'form': form,
+        'summary': get_summary(stocktake),
+        'differences': differences,
+    })
+
+
+@admin_required
+@require_POST
+def stocktake_apply(request, pk):
+    stocktake = get_object_or_404(Stocktake, pk=pk)
+    try:
+        adjusted = apply_stocktake(stocktake, request.user)
+    except StocktakeError as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, f'Инвентаризация проведена, скорректировано товаров: {adjusted}')
+    return redirect('warehouse:stocktake_detail', pk=pk)
+
+
+@admin_required
+@require_POST
+def stocktake_cancel(request, pk):
+    stocktake = get_object_or_404(Stocktake, pk=pk)
+    try:
+        cancel_stocktake(stocktake)
+    except StocktakeError as e:
+        messages.error(request, str(e))
+    else:
+        messages.info(request, f'Инвентаризация №{stocktake.pk} отменена')
+    return redirect('warehouse:stocktake_detail', pk=pk)
+
+
+@admin_required
+@require_POST
+def api_stocktake_counts(request, pk):
+    stocktake = get_object_or_404(Stocktake, pk=pk)
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    counts = payload.get('counts') if isinstance(payload, dict) else None
+    if not isinstance(counts, list):
+        return JsonResponse({'error': 'Expected {"counts": [...]}'}, status=400)
+    for idx, count in enumerate(counts):
+        if (
+            not isinstance(count, dict)
+            or not isinstance(count.get('sku'), str)
+            or isinstance(count.get('quantity'), bool)
+            or not isinstance(count.get('quantity'), int)
+            or count['quantity'] < 0
+        ):
+            return JsonResponse({'error': f'Count {idx}: expected sku and non-negative quantity'}, status=400)
+
+    try:
+        recorded, unknown = record_counts(
+            stocktake, ((count['sku'], count['quantity']) for count in counts)
+        )
+    except StocktakeError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+
+    return JsonResponse({'recorded': recorded, 'unknown': unknown})
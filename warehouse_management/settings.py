@@ -62,6 +62,29 @@ DATABASES = {
     }
 }
 
+# Кэш локален для процесса: при нескольких воркерах кэш пользователей
+# устаревает не более чем на USER_CACHE_TIMEOUT, для мгновенного сброса
+# используйте общий бэкенд (Redis, Memcached)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'warehouse',
+    }
+}
+
+# Сессии хранятся в базе: cached_db с локальным кэшем процесса не видит
+# выхода и изменений сессии, сделанных другим воркером. Переключать на
+# cached_db только вместе с общим кэшем (Redis, Memcached)
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+AUTHENTICATION_BACKENDS = [
+    'warehouse.backends.CachedModelBackend',
+]
+
+USER_CACHE_TIMEOUT = 300
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -90,6 +113,19 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+MOVEMENT_ARCHIVE_ROOT = BASE_DIR / 'archive' / 'movements'
+MOVEMENT_RETENTION_MONTHS = 12
+
+SCAN_BATCH_MAX_SIZE = 1000
+
+PRODUCT_API_PAGE_SIZE = 100
+PRODUCT_API_MAX_PAGE_SIZE = 5000
+
+# ReportLab загружается при первой генерации PDF. Воркерам, которые
+# обслуживают накладные и листы сборки, можно включить прогрев при старте:
+# WAREHOUSE_PRELOAD_PDF=1
+PRELOAD_PDF = os.environ.get('WAREHOUSE_PRELOAD_PDF') == '1'
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 from django.contrib.messages import constants as messages